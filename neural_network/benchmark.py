@@ -0,0 +1,308 @@
+import argparse
+import glob
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+'''
+Throughput benchmarks for the neural network, on CPU.
+
+Measures, for a fixed (seeded) sample of the NN files:
+- data loading time (reading the NN files the same way run_nn does)
+- training samples / sec for several batch sizes
+- inference latency (p50 / p95 / p99) for a single row and for batches
+- peak memory (max resident set size) after each of the above
+
+TensorFlow's thread pools can only be configured before it starts up, so each thread setting
+runs in its own worker process (this script with --worker). The orchestrating process never imports TensorFlow.
+
+Results are printed as a table and saved to ./benchmarks/{timestamp}_{commit}.json, along with the
+commit, settings and library versions, so runs from different commits can be compared with --compare.
+
+Run as `python benchmark.py` from the neural_network folder. Use --quick for a short smoke run.
+'''
+
+SEED = 4420
+NN_FILES_GLOB = "../datafiles/NN_files/NN_*.csv"
+RESULTS_DIR = "./benchmarks"
+RESULT_PREFIX = "BENCHMARK_RESULT "
+
+SAMPLE_ROWS = 20000
+TRAIN_BATCH_SIZES = [32, 128, 512, 2048]
+# 0 means TensorFlow's default (use every core)
+THREAD_SETTINGS = [1, 2, 4, 0]
+INFERENCE_BATCH_SIZES = [1, 32, 512, 4096]
+# the first epoch is a warmup (graph tracing) and is not counted
+TRAIN_EPOCHS = 4
+LATENCY_REPEATS = 200
+
+QUICK_SETTINGS = {
+    "sample_rows": 2000,
+    "train_batch_sizes": [128],
+    "thread_settings": [0],
+    "inference_batch_sizes": [1, 512],
+    "train_epochs": 2,
+    "latency_repeats": 20
+}
+
+'''
+Peak resident memory of this process so far, in MB.
+'''
+def peak_rss_mb() -> float:
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # linux reports KB, macOS reports bytes
+    return max_rss / (1024 * 1024) if sys.platform == "darwin" else max_rss / 1024
+
+'''
+Returns (value at the 50th, 95th, 99th percentile) of the provided timings, in milliseconds.
+'''
+def latency_percentiles(seconds: list[float]) -> dict:
+    ms = np.array(seconds) * 1000
+    return {
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99))
+    }
+
+def current_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+'''
+Loads the benchmark dataset. Returns (X, Y, load_seconds).
+
+Uses a seeded sample of sample_rows rows from the NN files, or a synthetic dataset with the same
+columns / value ranges if synthetic is True (or the NN files are missing). load_seconds is the time
+taken to read the NN files, and is 0 for synthetic data.
+'''
+def load_benchmark_data(sample_rows: int, use_voteview: bool, synthetic: bool):
+    from neural_network import INPUT_COLUMNS, INPUT_COLUMNS_NO_VV, OUTPUT_COLUMN, load_nn_files
+
+    columns = INPUT_COLUMNS if use_voteview else INPUT_COLUMNS_NO_VV
+    nn_file_paths = sorted(glob.glob(NN_FILES_GLOB))
+
+    if synthetic or not nn_file_paths:
+        rng = np.random.default_rng(SEED)
+        # party / chamber are 0 or 1, scaled counts are in [0, 1], voteview dimensions are in [-1, 1]
+        X = rng.random((sample_rows, len(columns))).astype(np.float32)
+        X[:, :3] = np.round(X[:, :3])
+        X[:, 7:] = X[:, 7:] * 2 - 1
+        Y = (rng.random(sample_rows) < 0.6).astype(np.float32)
+        return X, Y, 0.0
+
+    start = time.perf_counter()
+    data_df = load_nn_files(nn_file_paths)
+    load_seconds = time.perf_counter() - start
+
+    sample_df = data_df.sample(n=min(sample_rows, len(data_df)), random_state=SEED)
+    X = sample_df[columns].to_numpy(dtype=np.float32)
+    Y = sample_df[OUTPUT_COLUMN].to_numpy(dtype=np.float32)
+    return X, Y, load_seconds
+
+'''
+Trains a fresh model for the given number of epochs and returns the training throughput.
+'''
+def benchmark_training(X: np.ndarray, Y: np.ndarray, batch_size: int, epochs: int) -> dict:
+    import keras
+    from neural_network import make_model
+
+    keras.utils.set_random_seed(SEED)
+    epoch_seconds = []
+
+    class EpochTimer(keras.callbacks.Callback):
+        def on_epoch_begin(self, epoch, logs=None):
+            self.start = time.perf_counter()
+
+        def on_epoch_end(self, epoch, logs=None):
+            epoch_seconds.append(time.perf_counter() - self.start)
+
+    model = make_model(X.shape[1])
+    model.fit(X, Y, batch_size=batch_size, epochs=epochs, verbose=0, callbacks=[EpochTimer()])
+
+    # skip the warmup epoch, unless it is the only one
+    timed = epoch_seconds[1:] or epoch_seconds
+    median_epoch = float(np.median(timed))
+
+    return {
+        "batch_size": batch_size,
+        "median_epoch_s": median_epoch,
+        "samples_per_s": len(X) / median_epoch
+    }
+
+'''
+Times model.predict on batches of batch_size rows, repeats times (after a warmup call).
+'''
+def benchmark_inference(model, X: np.ndarray, batch_size: int, repeats: int) -> dict:
+    batch = X[:batch_size]
+    model.predict(batch, verbose=0)
+
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        model.predict(batch, verbose=0)
+        timings.append(time.perf_counter() - start)
+
+    result = {"batch_size": len(batch)}
+    result.update(latency_percentiles(timings))
+    result["rows_per_s"] = len(batch) / float(np.median(timings))
+    return result
+
+'''
+Runs every benchmark for a single thread setting. Must run in a fresh process, since the thread
+setting has to be applied before TensorFlow does anything.
+'''
+def run_worker(threads: int, settings: dict) -> dict:
+    import tensorflow as tf
+    import keras
+
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(threads)
+    keras.utils.set_random_seed(SEED)
+
+    result = {"threads": threads, "tensorflow": tf.__version__, "keras": keras.__version__}
+
+    X, Y, load_seconds = load_benchmark_data(settings["sample_rows"], settings["use_voteview"], settings["synthetic"])
+    result["load_s"] = load_seconds
+    result["rows"] = len(X)
+    result["peak_rss_mb_after_load"] = peak_rss_mb()
+
+    result["training"] = [benchmark_training(X, Y, batch_size, settings["train_epochs"])
+                          for batch_size in settings["train_batch_sizes"]]
+    result["peak_rss_mb_after_training"] = peak_rss_mb()
+
+    from neural_network import make_model
+    model = make_model(X.shape[1])
+    result["inference"] = [benchmark_inference(model, X, batch_size, settings["latency_repeats"])
+                           for batch_size in settings["inference_batch_sizes"]]
+    result["peak_rss_mb_after_inference"] = peak_rss_mb()
+
+    return result
+
+def print_report(report: dict):
+    print(f"\nCommit {report['commit']}, {report['rows']} rows, seed {report['settings']['seed']}")
+
+    for worker in report["workers"]:
+        threads = worker["threads"] or "default"
+        print(f"\n== threads: {threads} ==")
+        print(f"load: {worker['load_s']:.2f}s, peak RSS (MB) load / train / inference: "
+              f"{worker['peak_rss_mb_after_load']:.0f} / {worker['peak_rss_mb_after_training']:.0f} / "
+              f"{worker['peak_rss_mb_after_inference']:.0f}")
+
+        print(f"{'train batch':>12} {'epoch (s)':>10} {'samples/s':>12}")
+        for row in worker["training"]:
+            print(f"{row['batch_size']:>12} {row['median_epoch_s']:>10.3f} {row['samples_per_s']:>12.0f}")
+
+        print(f"{'infer batch':>12} {'p50 (ms)':>10} {'p95 (ms)':>10} {'p99 (ms)':>10} {'rows/s':>12}")
+        for row in worker["inference"]:
+            print(f"{row['batch_size']:>12} {row['p50_ms']:>10.2f} {row['p95_ms']:>10.2f} "
+                  f"{row['p99_ms']:>10.2f} {row['rows_per_s']:>12.0f}")
+
+'''
+Prints the relative change of the throughput / latency numbers between two saved reports.
+'''
+def print_comparison(baseline: dict, report: dict):
+    print(f"\nChange from {baseline['commit']} to {report['commit']} (positive = faster)")
+
+    baseline_workers = {w["threads"]: w for w in baseline["workers"]}
+    for worker in report["workers"]:
+        old = baseline_workers.get(worker["threads"])
+        if old is None:
+            continue
+
+        threads = worker["threads"] or "default"
+        old_training = {row["batch_size"]: row for row in old["training"]}
+        for row in worker["training"]:
+            if row["batch_size"] in old_training:
+                change = row["samples_per_s"] / old_training[row["batch_size"]]["samples_per_s"] - 1
+                print(f"threads {threads}, train batch {row['batch_size']}: {change:+.1%} samples/s")
+
+        old_inference = {row["batch_size"]: row for row in old["inference"]}
+        for row in worker["inference"]:
+            if row["batch_size"] in old_inference:
+                change = old_inference[row["batch_size"]]["p50_ms"] / row["p50_ms"] - 1
+                print(f"threads {threads}, infer batch {row['batch_size']}: {change:+.1%} p50 latency")
+
+        if old["load_s"] > 0 and worker["load_s"] > 0:
+            print(f"threads {threads}, load: {old['load_s'] / worker['load_s'] - 1:+.1%}")
+
+def run_benchmarks(settings: dict) -> dict:
+    workers = []
+
+    for threads in settings["thread_settings"]:
+        print(f"Benchmarking with threads = {threads or 'default'}")
+        completed = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--worker", str(threads), "--settings", json.dumps(settings)],
+            capture_output=True, text=True
+        )
+
+        result_lines = [line for line in completed.stdout.splitlines() if line.startswith(RESULT_PREFIX)]
+        if completed.returncode != 0 or not result_lines:
+            print(completed.stderr)
+            raise RuntimeError(f"benchmark worker for threads = {threads} failed")
+
+        workers.append(json.loads(result_lines[-1][len(RESULT_PREFIX):]))
+
+    return {
+        "commit": current_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "rows": workers[0]["rows"],
+        "settings": settings,
+        "environment": {
+            "python": sys.version.split()[0],
+            "tensorflow": workers[0]["tensorflow"],
+            "keras": workers[0]["keras"],
+            "cpu_count": os.cpu_count(),
+            "platform": sys.platform
+        },
+        "workers": workers
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CPU training / inference benchmarks for the neural network")
+    parser.add_argument("--quick", action="store_true", help="a small, fast run for checking the benchmark works")
+    parser.add_argument("--synthetic", action="store_true", help="use synthetic data instead of sampling the NN files")
+    parser.add_argument("--use-voteview", action="store_true", help="include the voteview dimensions as inputs")
+    parser.add_argument("--compare", help="a saved report to compare this run against")
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--settings", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        print(RESULT_PREFIX + json.dumps(run_worker(args.worker, json.loads(args.settings))))
+        sys.exit(0)
+
+    settings = {
+        "seed": SEED,
+        "sample_rows": SAMPLE_ROWS,
+        "train_batch_sizes": TRAIN_BATCH_SIZES,
+        "thread_settings": THREAD_SETTINGS,
+        "inference_batch_sizes": INFERENCE_BATCH_SIZES,
+        "train_epochs": TRAIN_EPOCHS,
+        "latency_repeats": LATENCY_REPEATS,
+        "use_voteview": args.use_voteview,
+        "synthetic": args.synthetic
+    }
+    if args.quick:
+        settings.update(QUICK_SETTINGS)
+
+    report = run_benchmarks(settings)
+    print_report(report)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    report_path = f"{RESULTS_DIR}/{datetime.now().strftime('%Y%m%d_%H%M%S')}_{report['commit']}.json"
+    with open(report_path, "w") as report_file:
+        json.dump(report, report_file, indent=2)
+    print(f"\nSaved to {report_path}")
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            print_comparison(json.load(baseline_file), report)
@@ -0,0 +1,288 @@
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+'''
+Data-parallel training on a single (many-core) CPU host.
+
+run_nn_distributed starts num_workers local worker processes (this script with --worker), which train
+one model together with TensorFlow's MultiWorkerMirroredStrategy over localhost: every worker has a copy
+of the model, takes its own shard of each batch, and the gradients are all-reduced before every update.
+The batch size is the global batch size, split across the workers, so the updates are the same as a
+single-process run with that batch size - just computed by more cores. (The last partial batch of each
+epoch is dropped, so all workers run the same number of steps.)
+
+Every worker seeds the same way (so they start from the same weights and split / shuffle the data the same way),
+and the first worker (the chief) saves the model. Once the workers are done, this process evaluates the saved
+model on the test set and writes the same files as run_nn to ./runs/{UUID}/, plus the epoch times.
+
+scaling_report trains with several numbers of workers and reports epoch time, speedup and efficiency
+for each, in ./runs/scaling_{UUID}/.
+
+Run as `python distributed_training.py --workers 4` (or --scaling 1 2 4) from the neural_network folder.
+'''
+
+SEED = 4420
+DEFAULT_BATCH_SIZE = 32
+WORKER_HOST = "localhost"
+
+'''
+Returns num_ports free ports on localhost for the workers to talk to each other on.
+'''
+def free_ports(num_ports: int) -> list[int]:
+    sockets = []
+    for _ in range(num_ports):
+        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        s.bind((WORKER_HOST, 0))
+        sockets.append(s)
+
+    ports = [s.getsockname()[1] for s in sockets]
+    for s in sockets:
+        s.close()
+
+    return ports
+
+'''
+Splits the NN data into train / val / test (80 / 10 / 10) the same way in every process.
+'''
+def split_nn_data(nn_file_paths: list[str], seed: int):
+    from sklearn.model_selection import train_test_split
+    from neural_network import load_nn_files
+
+    data_df = load_nn_files(nn_file_paths)
+    train_data, rem_data = train_test_split(data_df, test_size=0.2, random_state=seed)
+    val_data, test_data = train_test_split(rem_data, test_size=0.5, random_state=seed)
+
+    return train_data, val_data, test_data
+
+'''
+The training loop of a single worker. TF_CONFIG has to be set before TensorFlow is imported.
+
+Keras' model.fit doesn't support MultiWorkerMirroredStrategy with more than one worker (it fails on the
+per-replica batches), so this is a custom loop around strategy.run, with the model, optimizer and loss from make_model.
+'''
+def train_worker(worker_index: int, settings: dict):
+    os.environ["TF_CONFIG"] = json.dumps({
+        "cluster": {"worker": [f"{WORKER_HOST}:{port}" for port in settings["ports"]]},
+        "task": {"type": "worker", "index": worker_index}
+    })
+
+    import keras
+    import tensorflow as tf
+    from sklearn.metrics import roc_auc_score
+    from neural_network import INPUT_COLUMNS, INPUT_COLUMNS_NO_VV, OUTPUT_COLUMN, make_model
+
+    seed = settings["seed"]
+    batch_size = settings["batch_size"]
+    is_chief = worker_index == 0
+    keras.utils.set_random_seed(seed)
+
+    strategy = tf.distribute.MultiWorkerMirroredStrategy(
+        communication_options=tf.distribute.experimental.CommunicationOptions(
+            implementation=tf.distribute.experimental.CommunicationImplementation.RING
+        )
+    )
+
+    columns = INPUT_COLUMNS if settings["use_voteview"] else INPUT_COLUMNS_NO_VV
+    train_data, val_data, _ = split_nn_data(settings["nn_file_paths"], seed)
+
+    X_train = train_data[columns].to_numpy(dtype=np.float32)
+    Y_train = train_data[OUTPUT_COLUMN].to_numpy(dtype=np.float32)
+    X_val = val_data[columns].to_numpy(dtype=np.float32)
+    Y_val = val_data[OUTPUT_COLUMN].to_numpy(dtype=np.float32)
+
+    # every worker shuffles the same way (same seed), then keeps its own shard of each global batch.
+    # the last partial batch is dropped so every worker runs the same number of steps
+    options = tf.data.Options()
+    options.experimental_distribute.auto_shard_policy = tf.data.experimental.AutoShardPolicy.DATA
+    train_dataset = tf.data.Dataset.from_tensor_slices((X_train, Y_train)) \
+        .shuffle(len(X_train), seed=seed, reshuffle_each_iteration=True) \
+        .batch(batch_size, drop_remainder=True) \
+        .with_options(options) \
+        .prefetch(tf.data.AUTOTUNE)
+    distributed_dataset = strategy.experimental_distribute_dataset(train_dataset)
+    steps_per_epoch = len(X_train) // batch_size
+
+    with strategy.scope():
+        model = make_model(len(columns))
+        optimizer = model.optimizer
+
+    @tf.function
+    def train_step(iterator):
+        def step_fn(X, Y):
+            with tf.GradientTape() as tape:
+                preds = model([X], training=True)
+                per_example_loss = keras.losses.binary_crossentropy(tf.expand_dims(Y, -1), preds)
+                # averaged over the global batch, so summing the replicas' gradients gives the full batch's gradient
+                loss = tf.nn.compute_average_loss(per_example_loss, global_batch_size=batch_size)
+
+            gradients = tape.gradient(loss, model.trainable_variables)
+            optimizer.apply_gradients(zip(gradients, model.trainable_variables))
+
+            correct = tf.reduce_sum(tf.cast(tf.equal(tf.cast(preds[:, 0] > 0.5, tf.float32), Y), tf.float32))
+            return loss, correct
+
+        loss, correct = strategy.run(step_fn, args=next(iterator))
+        return (strategy.reduce(tf.distribute.ReduceOp.SUM, loss, axis=None),
+                strategy.reduce(tf.distribute.ReduceOp.SUM, correct, axis=None))
+
+    history = []
+    epoch_seconds = []
+
+    for epoch in range(settings["num_epochs"]):
+        start = time.perf_counter()
+
+        iterator = iter(distributed_dataset)
+        total_loss, total_correct = 0.0, 0.0
+        for _ in range(steps_per_epoch):
+            loss, correct = train_step(iterator)
+            total_loss += float(loss)
+            total_correct += float(correct)
+
+        epoch_seconds.append(time.perf_counter() - start)
+
+        # only the chief checks the validation set, the weights are the same on every worker
+        if is_chief:
+            val_preds = np.concatenate([model([X_val[i:i + 4096]], training=False).numpy()[:, 0]
+                                        for i in range(0, len(X_val), 4096)])
+            val_preds_clipped = np.clip(val_preds, 1e-7, 1 - 1e-7)
+
+            history.append({
+                "loss": total_loss / steps_per_epoch,
+                "accuracy": total_correct / (steps_per_epoch * batch_size),
+                "val_loss": float(-np.mean(Y_val * np.log(val_preds_clipped) + (1 - Y_val) * np.log(1 - val_preds_clipped))),
+                "val_accuracy": float(np.mean((val_preds > 0.5) == Y_val)),
+                "val_auc": float(roc_auc_score(Y_val, val_preds))
+            })
+            print(f"Epoch {epoch + 1}/{settings['num_epochs']} ({epoch_seconds[-1]:.2f}s): "
+                  + ", ".join(f"{name}: {value:.4f}" for name, value in history[-1].items()))
+
+    if is_chief:
+        run_dir = settings["run_dir"]
+        model.save(f"{run_dir}/model.keras")
+        pd.DataFrame(history).to_csv(f"{run_dir}/training_history.csv", index=False)
+        pd.DataFrame({"epoch": range(len(epoch_seconds)), "seconds": epoch_seconds}) \
+            .to_csv(f"{run_dir}/epoch_times.csv", index=False)
+
+'''
+Trains a Neural Network on the provided NN files with num_workers local worker processes.
+
+The model, training history, epoch times, test metrics and anecdotal analysis are saved to ./runs/{UUID}/.
+Returns the run id.
+'''
+def run_nn_distributed(nn_file_paths: list[str], use_voteview: bool, num_epochs: int, num_workers: int,
+                       batch_size: int = DEFAULT_BATCH_SIZE, seed: int = SEED) -> str:
+    run_id = str(uuid.uuid1())
+    run_dir = f"./runs/{run_id}"
+    os.makedirs(run_dir, exist_ok=True)
+    print("Run ID: ", run_id, f"({num_workers} workers)")
+
+    settings = {
+        "nn_file_paths": nn_file_paths,
+        "use_voteview": use_voteview,
+        "num_epochs": num_epochs,
+        "batch_size": batch_size,
+        "seed": seed,
+        "ports": free_ports(num_workers),
+        "run_dir": run_dir
+    }
+
+    workers = [
+        subprocess.Popen([sys.executable, os.path.abspath(__file__), "--worker", str(i), "--settings", json.dumps(settings)])
+        for i in range(num_workers)
+    ]
+    return_codes = [worker.wait() for worker in workers]
+
+    if any(return_codes):
+        raise RuntimeError(f"distributed training failed, worker exit codes: {return_codes}")
+
+    from tensorflow.keras.models import load_model
+    from anecdotal_analysis import anecdotal_analysis
+    from neural_network import INPUT_COLUMNS, INPUT_COLUMNS_NO_VV, OUTPUT_COLUMN, METRIC_NAMES
+
+    columns = INPUT_COLUMNS if use_voteview else INPUT_COLUMNS_NO_VV
+    _, _, test_data = split_nn_data(nn_file_paths, seed)
+
+    model = load_model(f"{run_dir}/model.keras")
+    score = model.evaluate(test_data[columns], test_data[OUTPUT_COLUMN])
+
+    with open(f"{run_dir}/test_info.txt", "w") as test_info_file:
+        test_info_file.write(f"Trained with {num_workers} workers, global batch size {batch_size}, seed {seed}")
+        for metric, value in zip(METRIC_NAMES, score):
+            test_info_file.write(f"\nTest {metric}: {value}")
+
+        anecdotal_analysis(model, test_info_file, use_voteview=use_voteview)
+
+    return run_id
+
+'''
+Trains with each number of workers in worker_counts and reports the median epoch time (the first epoch,
+which includes setup and tracing, is left out), speedup and parallel efficiency relative to the first count.
+
+The report is printed and saved to ./runs/scaling_{UUID}/scaling_report.csv.
+'''
+def scaling_report(nn_file_paths: list[str], use_voteview: bool, num_epochs: int, worker_counts: list[int],
+                   batch_size: int = DEFAULT_BATCH_SIZE, seed: int = SEED) -> pd.DataFrame:
+    rows = []
+
+    for num_workers in worker_counts:
+        run_id = run_nn_distributed(nn_file_paths, use_voteview, num_epochs, num_workers, batch_size, seed)
+        epoch_times = pd.read_csv(f"./runs/{run_id}/epoch_times.csv")["seconds"]
+        timed = epoch_times.iloc[1:] if len(epoch_times) > 1 else epoch_times
+
+        with open(f"./runs/{run_id}/test_info.txt") as test_info_file:
+            test_auc = [line for line in test_info_file.read().splitlines() if line.startswith("Test AUC")]
+
+        rows.append({
+            "workers": num_workers,
+            "run_id": run_id,
+            "median_epoch_s": float(timed.median()),
+            "first_epoch_s": float(epoch_times.iloc[0]),
+            "test_auc": float(test_auc[0].split(": ")[1]) if test_auc else np.nan
+        })
+
+    report = pd.DataFrame(rows)
+    baseline = report.iloc[0]
+    report["speedup"] = baseline["median_epoch_s"] / report["median_epoch_s"]
+    report["efficiency"] = report["speedup"] * baseline["workers"] / report["workers"]
+
+    report_dir = f"./runs/scaling_{uuid.uuid1()}"
+    os.makedirs(report_dir, exist_ok=True)
+    report.to_csv(f"{report_dir}/scaling_report.csv", index=False)
+
+    print(f"\nScaling ({os.cpu_count()} CPU cores, global batch size {batch_size}):")
+    print(report.to_string(index=False, float_format="%.3f"))
+    print(f"Saved to {report_dir}/scaling_report.csv")
+
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="data-parallel training of the neural network on one CPU host")
+    parser.add_argument("--workers", type=int, default=2, help="number of worker processes")
+    parser.add_argument("--scaling", type=int, nargs="+", help="numbers of workers to compare in a scaling report")
+    parser.add_argument("--epochs", type=int, default=250)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="global batch size")
+    parser.add_argument("--use-voteview", action="store_true")
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--settings", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        train_worker(args.worker, json.loads(args.settings))
+        sys.exit(0)
+
+    nn_file_paths = [f"../datafiles/NN_files/NN_{chamber}_{congress}.csv"
+                     for congress in range(107, 120) for chamber in ("HOUSE", "SENATE")]
+
+    if args.scaling:
+        scaling_report(nn_file_paths, args.use_voteview, args.epochs, args.scaling, args.batch_size)
+    else:
+        run_nn_distributed(nn_file_paths, args.use_voteview, args.epochs, args.workers, args.batch_size)
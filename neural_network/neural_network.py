@@ -4,13 +4,14 @@ import os
 import pandas as pd
 import matplotlib.pyplot as plt
 
-from tensorflow.keras.models import Model
+from tensorflow.keras.models import Model, load_model
 from tensorflow.keras.losses import binary_crossentropy
 from tensorflow.keras.layers import Dense, Input
 from tensorflow.keras.optimizers import Adam
 from sklearn.model_selection import train_test_split
 
 from anecdotal_analysis import anecdotal_analysis
+from profiling import TrainingProfiler, end_phase
 
 INPUT_COLUMNS = [
     "party_code_1", "party_code_2", "chamber",
@@ -30,6 +31,8 @@ INPUT_COLUMNS_NO_VV = [
 
 OUTPUT_COLUMN = "vote"
 
+METRIC_NAMES = ["Binary Cross-Entropy", "Accuracy", "MSE", "AUC"]
+
 '''
 Creates a model for the provided number of features (one-dimensional).
 '''
@@ -44,14 +47,26 @@ def make_model(num_input_features: int) -> Model:
     out = Dense(1, activation='sigmoid')(hid_layer4)
 
     model = Model([inpx], out)
+    compile_model(model, learning_rate=0.0015)
+
+    return model
 
-    model.compile(optimizer=Adam(learning_rate=0.0015),
+'''
+Compiles the model with the loss / metrics used for every run (the order of the metrics matters,
+model.evaluate returns [loss, accuracy, mse, auc]).
+'''
+def compile_model(model: Model, learning_rate: float):
+    model.compile(optimizer=Adam(learning_rate=learning_rate),
                   # AKA Log loss
                   loss=binary_crossentropy,
                   # use accuracy and mse cautiously
                   metrics=['accuracy', 'mse', 'auc'])
 
-    return model
+'''
+Reads the provided NN files into a single DataFrame.
+'''
+def load_nn_files(nn_file_paths: list[str]) -> pd.DataFrame:
+    return pd.concat([pd.read_csv(file_path) for file_path in nn_file_paths], ignore_index=True)
 
 '''
 Trains a Neural Network using the information in the provided NN file paths.
@@ -59,18 +74,20 @@ The network is trained for the provided number of epochs and either uses votevie
 (for lawmakers and median leg. support) or not. The dimensions / composition of the model is fixed. 
 
 Saves the model, relevant plots, and the anecdotal analysis to a folder in ./runs/{UUID}/
+
+If profile is True, also records where the time goes (see profiling.py) to ./runs/{UUID}/profile/,
+including a TensorFlow profiler trace if profile_trace is True.
 '''
-def run_nn(nn_file_paths: list[str], use_voteview: bool, num_epochs: int):
+def run_nn(nn_file_paths: list[str], use_voteview: bool, num_epochs: int, profile: bool = False,
+           profile_trace: bool = False):
     run_id = str(uuid.uuid1())
     os.makedirs(f'./runs/{run_id}', exist_ok=True)
     print("Run ID: ", run_id)
 
-    data_df = pd.DataFrame()
+    profiler = TrainingProfiler(f'./runs/{run_id}/profile', trace=profile_trace) if profile else None
 
-    for file_path in nn_file_paths:
-        current_df = pd.read_csv(file_path)
-
-        data_df = pd.concat([data_df, current_df], ignore_index=True)
+    data_df = load_nn_files(nn_file_paths)
+    end_phase(profiler, "load NN files")
 
     train_data, rem_data = train_test_split(data_df, test_size=0.2)
     # so the val and test sets are each 10% of the total data
@@ -89,14 +106,25 @@ def run_nn(nn_file_paths: list[str], use_voteview: bool, num_epochs: int):
     # always checking for some class imbalance
     print(Y_train.value_counts())
     print(Y_test.value_counts())
+    end_phase(profiler, "pandas preparation")
+
+    if profiler is not None:
+        profiler.measure_input_pipeline(X_train, Y_train)
 
     model = make_model(len(columns))
+    end_phase(profiler, "make model")
+
+    if profiler is not None:
+        profiler.before_fit()
+
     training = model.fit(
         X_train,
         Y_train,
         epochs=num_epochs,
         validation_data=(X_val, Y_val),
+        callbacks=[profiler] if profiler is not None else None,
     )
+    end_phase(profiler, "fit")
 
     plt.clf()
     plt.plot(training.history.get('accuracy', []), label='accuracy')
@@ -122,6 +150,7 @@ def run_nn(nn_file_paths: list[str], use_voteview: bool, num_epochs: int):
 
     # save the csv file of training history in case we want to inspect it later
     pd.DataFrame(training.history).to_csv(f'./runs/{run_id}/training_history.csv', index=False)
+    end_phase(profiler, "training plots")
 
     score = model.evaluate(X_test, Y_test)
 
@@ -133,41 +162,119 @@ def run_nn(nn_file_paths: list[str], use_voteview: bool, num_epochs: int):
 
         anecdotal_analysis(model, test_info_file, use_voteview=use_voteview)
 
+    end_phase(profiler, "evaluate + anecdotal analysis")
+
     preds = model.predict(X_test)
 
     plt.clf()
     plt.hist(preds, bins=20)
     plt.title(f"Distribution of Test Predictions: Yes = {Y_test.value_counts()[1]}, Nos = {Y_test.value_counts()[0]}")
     plt.savefig(f'./runs/{run_id}/predictions_hist.png', dpi=300)
+    end_phase(profiler, "predict + histogram")
 
     model.save(f"./runs/{run_id}/model.keras")
 
-run_nn([
-    "../datafiles/NN_files/NN_HOUSE_107.csv",
-    "../datafiles/NN_files/NN_SENATE_107.csv",
-    "../datafiles/NN_files/NN_HOUSE_108.csv",
-    "../datafiles/NN_files/NN_SENATE_108.csv",
-    "../datafiles/NN_files/NN_HOUSE_109.csv",
-    "../datafiles/NN_files/NN_SENATE_109.csv",
-    "../datafiles/NN_files/NN_HOUSE_110.csv",
-    "../datafiles/NN_files/NN_SENATE_110.csv",
-    "../datafiles/NN_files/NN_HOUSE_111.csv",
-    "../datafiles/NN_files/NN_SENATE_111.csv",
-    "../datafiles/NN_files/NN_HOUSE_112.csv",
-    "../datafiles/NN_files/NN_SENATE_112.csv",
-    "../datafiles/NN_files/NN_HOUSE_113.csv",
-    "../datafiles/NN_files/NN_SENATE_113.csv",
-    "../datafiles/NN_files/NN_HOUSE_114.csv",
-    "../datafiles/NN_files/NN_SENATE_114.csv",
-    "../datafiles/NN_files/NN_HOUSE_115.csv",
-    "../datafiles/NN_files/NN_SENATE_115.csv",
-    "../datafiles/NN_files/NN_HOUSE_116.csv",
-    "../datafiles/NN_files/NN_SENATE_116.csv",
-    "../datafiles/NN_files/NN_HOUSE_117.csv",
-    "../datafiles/NN_files/NN_SENATE_117.csv",
-    "../datafiles/NN_files/NN_HOUSE_118.csv",
-    "../datafiles/NN_files/NN_SENATE_118.csv",
-    "../datafiles/NN_files/NN_HOUSE_119.csv",
-    "../datafiles/NN_files/NN_SENATE_119.csv"
-], use_voteview=False, num_epochs=250)
+    end_phase(profiler, "save model")
+
+    if profiler is not None:
+        profiler.save()
+
+'''
+Fine-tunes the model from an earlier run (./runs/{base_run_id}/model.keras) when new NN files (e.g. a new congress)
+are added, instead of training a new model on every file from scratch.
+
+The model is trained for a few epochs, at a lower learning rate, on the new files plus a replay sample of at most
+replay_rows rows from older NN files, so it doesn't forget the older congresses. 10% of the new data and 10% of
+the replay sample are held out, and the model is evaluated on both before and after fine-tuning.
+
+Saves the model, training history and before/after metrics to a folder in ./runs/{UUID}/
+'''
+def fine_tune_nn(base_run_id: str, new_file_paths: list[str], replay_file_paths: list[str], num_epochs: int = 10,
+                 replay_rows: int = 100000, learning_rate: float = 0.0005, seed: int = 4420):
+    run_id = str(uuid.uuid1())
+    os.makedirs(f'./runs/{run_id}', exist_ok=True)
+    print("Run ID: ", run_id)
+    print("Fine-tuning from: ", base_run_id)
+
+    model = load_model(f"./runs/{base_run_id}/model.keras")
+    # the model's number of inputs tells us if it was trained with voteview dimensions
+    use_voteview = model.input_shape[-1] == len(INPUT_COLUMNS)
+    columns = INPUT_COLUMNS if use_voteview else INPUT_COLUMNS_NO_VV
+
+    new_df = load_nn_files(new_file_paths)
+    new_train, new_rem = train_test_split(new_df, test_size=0.2, random_state=seed)
+    new_val, new_test = train_test_split(new_rem, test_size=0.5, random_state=seed)
+
+    replay_df = load_nn_files(replay_file_paths)
+    replay_df = replay_df.sample(n=min(replay_rows, len(replay_df)), random_state=seed)
+    replay_train, replay_test = train_test_split(replay_df, test_size=0.1, random_state=seed)
+
+    train_data = pd.concat([new_train, replay_train], ignore_index=True).sample(frac=1, random_state=seed)
+
+    print(f"New rows: {len(new_train)} train, {len(new_test)} test. Replay rows: {len(replay_train)} train, {len(replay_test)} test")
+
+    held_out = {
+        "New": (new_test[columns], new_test[OUTPUT_COLUMN]),
+        "Replay": (replay_test[columns], replay_test[OUTPUT_COLUMN])
+    }
+
+    before = {name: model.evaluate(X, Y, verbose=0) for name, (X, Y) in held_out.items()}
+
+    compile_model(model, learning_rate=learning_rate)
+    training = model.fit(
+        train_data[columns],
+        train_data[OUTPUT_COLUMN],
+        epochs=num_epochs,
+        validation_data=(new_val[columns], new_val[OUTPUT_COLUMN]),
+    )
+
+    after = {name: model.evaluate(X, Y, verbose=0) for name, (X, Y) in held_out.items()}
+
+    pd.DataFrame(training.history).to_csv(f'./runs/{run_id}/training_history.csv', index=False)
+
+    with open(f'./runs/{run_id}/test_info.txt', 'w') as test_info_file:
+        test_info_file.write(f"Fine-tuned from run {base_run_id} for {num_epochs} epochs (learning rate {learning_rate})")
+        test_info_file.write(f"\nNew files: {new_file_paths}")
+        test_info_file.write(f"\nReplay: {len(replay_train)} rows sampled from {replay_file_paths}")
+
+        for name in held_out:
+            for i, metric in enumerate(METRIC_NAMES):
+                line = f"{name} Test {metric}: {before[name][i]} -> {after[name][i]}"
+                print(line)
+                test_info_file.write(f"\n{line}")
+
+        anecdotal_analysis(model, test_info_file, use_voteview=use_voteview)
+
+    model.save(f"./runs/{run_id}/model.keras")
 
+    return run_id
+
+if __name__ == "__main__":
+    run_nn([
+        "../datafiles/NN_files/NN_HOUSE_107.csv",
+        "../datafiles/NN_files/NN_SENATE_107.csv",
+        "../datafiles/NN_files/NN_HOUSE_108.csv",
+        "../datafiles/NN_files/NN_SENATE_108.csv",
+        "../datafiles/NN_files/NN_HOUSE_109.csv",
+        "../datafiles/NN_files/NN_SENATE_109.csv",
+        "../datafiles/NN_files/NN_HOUSE_110.csv",
+        "../datafiles/NN_files/NN_SENATE_110.csv",
+        "../datafiles/NN_files/NN_HOUSE_111.csv",
+        "../datafiles/NN_files/NN_SENATE_111.csv",
+        "../datafiles/NN_files/NN_HOUSE_112.csv",
+        "../datafiles/NN_files/NN_SENATE_112.csv",
+        "../datafiles/NN_files/NN_HOUSE_113.csv",
+        "../datafiles/NN_files/NN_SENATE_113.csv",
+        "../datafiles/NN_files/NN_HOUSE_114.csv",
+        "../datafiles/NN_files/NN_SENATE_114.csv",
+        "../datafiles/NN_files/NN_HOUSE_115.csv",
+        "../datafiles/NN_files/NN_SENATE_115.csv",
+        "../datafiles/NN_files/NN_HOUSE_116.csv",
+        "../datafiles/NN_files/NN_SENATE_116.csv",
+        "../datafiles/NN_files/NN_HOUSE_117.csv",
+        "../datafiles/NN_files/NN_SENATE_117.csv",
+        "../datafiles/NN_files/NN_HOUSE_118.csv",
+        "../datafiles/NN_files/NN_SENATE_118.csv",
+        "../datafiles/NN_files/NN_HOUSE_119.csv",
+        "../datafiles/NN_files/NN_SENATE_119.csv"
+    ], use_voteview=False, num_epochs=250)
@@ -0,0 +1,215 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+from tensorflow.keras.callbacks import Callback
+
+'''
+Opt-in profiling for run_nn (run_nn(..., profile=True)).
+
+Records, into ./runs/{run_id}/profile/:
+- phases.csv: wall time of each part of run_nn (loading / pandas preparation, fit, evaluation, plots, ...)
+- epochs.csv: per-epoch wall time, step time statistics, estimated input wait vs compute, and CPU utilization
+- steps.csv: every step's duration for the first PROFILE_STEP_EPOCHS epochs
+- summary.txt: a summary table of the above
+- a TensorFlow profiler trace of a few steps (if trace=True), viewable with TensorBoard's profile plugin
+
+Keras pulls the next batch from its input pipeline inside the compiled train step, so a callback can only
+time (input + compute) together. To split them, the input pipeline is timed on its own for one epoch
+(the same arrays, batched the same way, with no model attached), which gives the average input time per step.
+Compute is then the step time minus that.
+
+CPU utilization is the process' CPU time (all threads) divided by wall time, i.e. the average number of busy
+threads, and as a share of the machine's cores.
+'''
+
+# steps.csv only has the first few epochs, since there are thousands of steps per epoch
+PROFILE_STEP_EPOCHS = 3
+# which steps of the second epoch (the first is dominated by tracing) the profiler trace covers
+TRACE_EPOCH = 1
+TRACE_STEPS = (10, 30)
+
+def cpu_seconds() -> float:
+    times = os.times()
+    return times.user + times.system
+
+'''
+Records the time since the previous call as the phase "name" (see TrainingProfiler.end_phase),
+or does nothing if profiling is off (profiler is None).
+'''
+def end_phase(profiler, name: str):
+    if profiler is not None:
+        profiler.end_phase(name)
+
+'''
+Keras callback that records step / epoch timings during fit. Also times the phases of run_nn
+around fit (via end_phase()) and writes everything out with save().
+'''
+class TrainingProfiler(Callback):
+    def __init__(self, output_dir: str, trace: bool = False):
+        super().__init__()
+        self.output_dir = output_dir
+        self.trace = trace
+        os.makedirs(output_dir, exist_ok=True)
+
+        self.phases = []
+        self.epochs = []
+        self.steps = []
+        self.input_seconds_per_step = None
+        self.fit_called_at = None
+        self.fit_setup_seconds = None
+        self.tracing = False
+
+        self.phase_start = time.perf_counter()
+        self.phase_start_cpu = cpu_seconds()
+
+    '''
+    Ends the current phase: everything since the profiler was created or the last end_phase call.
+    '''
+    def end_phase(self, name: str):
+        now, now_cpu = time.perf_counter(), cpu_seconds()
+        self.phases.append({
+            "phase": name,
+            "wall_s": now - self.phase_start,
+            "cpu_s": now_cpu - self.phase_start_cpu
+        })
+        self.phase_start, self.phase_start_cpu = now, now_cpu
+
+    '''
+    Times one epoch of the input pipeline alone: the arrays batched the way model.fit batches them.
+    '''
+    def measure_input_pipeline(self, X: pd.DataFrame, Y: pd.Series, batch_size: int = 32):
+        dataset = tf.data.Dataset.from_tensor_slices((X.to_numpy(), Y.to_numpy())).batch(batch_size)
+
+        start = time.perf_counter()
+        num_batches = 0
+        for _ in dataset:
+            num_batches += 1
+
+        self.input_seconds_per_step = (time.perf_counter() - start) / max(num_batches, 1)
+        self.end_phase("input pipeline (measurement only)")
+
+    '''
+    Call right before model.fit, to measure how long fit takes to set up (e.g. converting the DataFrames).
+    '''
+    def before_fit(self):
+        self.fit_called_at = time.perf_counter()
+
+    def on_train_begin(self, logs=None):
+        if self.fit_called_at is not None:
+            self.fit_setup_seconds = time.perf_counter() - self.fit_called_at
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self.epoch_start = time.perf_counter()
+        self.epoch_start_cpu = cpu_seconds()
+        self.epoch_step_seconds = []
+        self.last_step_end = None
+        self.epoch_gap_seconds = 0.0
+
+    def on_train_batch_begin(self, batch, logs=None):
+        now = time.perf_counter()
+        # time spent outside of the step between two steps (callbacks, python overhead)
+        if self.last_step_end is not None:
+            self.epoch_gap_seconds += now - self.last_step_end
+
+        if self.trace and len(self.epochs) == TRACE_EPOCH and batch == TRACE_STEPS[0]:
+            tf.profiler.experimental.start(self.output_dir)
+            self.tracing = True
+
+        self.step_start = time.perf_counter()
+
+    def on_train_batch_end(self, batch, logs=None):
+        self.last_step_end = time.perf_counter()
+        step_seconds = self.last_step_end - self.step_start
+        self.epoch_step_seconds.append(step_seconds)
+
+        if len(self.epochs) < PROFILE_STEP_EPOCHS:
+            self.steps.append({"epoch": len(self.epochs), "step": batch, "step_s": step_seconds})
+
+        if self.tracing and batch == TRACE_STEPS[1]:
+            self.stop_trace()
+
+    def on_epoch_end(self, epoch, logs=None):
+        wall = time.perf_counter() - self.epoch_start
+        cpu = cpu_seconds() - self.epoch_start_cpu
+        step_seconds = np.array(self.epoch_step_seconds)
+        num_steps = len(step_seconds)
+
+        input_wait = (self.input_seconds_per_step or 0.0) * num_steps
+        total_step = float(step_seconds.sum())
+
+        self.epochs.append({
+            "epoch": epoch,
+            "wall_s": wall,
+            "steps": num_steps,
+            "step_mean_ms": float(step_seconds.mean() * 1000) if num_steps else 0.0,
+            "step_p50_ms": float(np.percentile(step_seconds, 50) * 1000) if num_steps else 0.0,
+            "step_p95_ms": float(np.percentile(step_seconds, 95) * 1000) if num_steps else 0.0,
+            "step_total_s": total_step,
+            "input_wait_s": min(input_wait, total_step),
+            "compute_s": max(total_step - input_wait, 0.0),
+            # validation, callbacks and python overhead between steps
+            "other_s": wall - total_step,
+            "between_steps_s": self.epoch_gap_seconds,
+            "busy_threads": cpu / wall if wall > 0 else 0.0,
+            "cpu_utilization": cpu / wall / (os.cpu_count() or 1) if wall > 0 else 0.0
+        })
+
+    def on_train_end(self, logs=None):
+        if self.tracing:
+            self.stop_trace()
+
+    def stop_trace(self):
+        tf.profiler.experimental.stop()
+        self.tracing = False
+
+    '''
+    Writes the csv files and the summary table, and prints the summary.
+    '''
+    def save(self):
+        phases_df = pd.DataFrame(self.phases)
+        epochs_df = pd.DataFrame(self.epochs)
+
+        phases_df.to_csv(f"{self.output_dir}/phases.csv", index=False)
+        epochs_df.to_csv(f"{self.output_dir}/epochs.csv", index=False)
+        pd.DataFrame(self.steps).to_csv(f"{self.output_dir}/steps.csv", index=False)
+
+        lines = [
+            f"TF threads (0 = default): intra-op {tf.config.threading.get_intra_op_parallelism_threads()}, "
+            f"inter-op {tf.config.threading.get_inter_op_parallelism_threads()}, CPU cores: {os.cpu_count()}",
+            "",
+            "Phases:",
+            phases_df.to_string(index=False, float_format="%.3f") if len(phases_df) else "(none)"
+        ]
+
+        if self.fit_setup_seconds is not None:
+            lines.append(f"\nmodel.fit setup (before the first epoch): {self.fit_setup_seconds:.3f}s")
+
+        if len(epochs_df):
+            # the first epoch includes tracing the train step, so it is reported separately
+            steady = epochs_df.iloc[1:] if len(epochs_df) > 1 else epochs_df
+            step_total = steady["step_total_s"].sum()
+
+            lines += [
+                "",
+                f"First epoch: {epochs_df['wall_s'].iloc[0]:.3f}s",
+                f"Later epochs: {steady['wall_s'].mean():.3f}s mean, {steady['steps'].mean():.0f} steps, "
+                f"{steady['step_p50_ms'].mean():.3f}ms p50 step, {steady['step_p95_ms'].mean():.3f}ms p95 step",
+                f"Input wait: {steady['input_wait_s'].sum() / step_total:.1%} of step time "
+                f"({(self.input_seconds_per_step or 0) * 1000:.3f}ms per step), compute: {steady['compute_s'].sum() / step_total:.1%}",
+                f"Outside of steps (validation, callbacks): {steady['other_s'].sum() / steady['wall_s'].sum():.1%} of epoch time",
+                f"CPU: {steady['busy_threads'].mean():.2f} busy threads on average, "
+                f"{steady['cpu_utilization'].mean():.1%} of all cores"
+            ]
+
+            if self.trace:
+                lines.append(f"(epoch {TRACE_EPOCH} includes the overhead of the profiler trace)")
+
+        summary = "\n".join(lines)
+        print(summary)
+
+        with open(f"{self.output_dir}/summary.txt", "w") as summary_file:
+            summary_file.write(summary)
+            summary_file.write("\n\nEpochs:\n" + epochs_df.to_string(index=False, float_format="%.3f"))
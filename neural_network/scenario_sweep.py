@@ -0,0 +1,200 @@
+import itertools
+import time
+
+import keras
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+from neural_network import INPUT_COLUMNS, INPUT_COLUMNS_NO_VV
+
+'''
+"What-if" sweeps: predicts how a set of members would vote on every bill in a grid of bill features
+(the bill's voteview position and / or its number of Democratic and Republican cosponsors).
+
+Instead of one model.predict call per (member, bill), the whole Cartesian product is evaluated in
+chunked, batched forward passes. The first Dense layer is linear, so its output for a (member, bill) pair
+is (member part) + (bill part) + bias. Each part is computed once - once per unique member, and once
+per value along each grid axis - and the pairs only need the sums pushed through the remaining layers.
+
+Grid values are in the same (scaled) units as the NN files, e.g. cosponsor counts are divided by 535.
+
+Example, for a model trained with the voteview dimensions:
+
+    sweep = ScenarioSweep(keras.models.load_model("./runs/{run_id}/model.keras"))
+    members = members_from_nn_file("../datafiles/NN_files/NN_SENATE_118.csv")
+    result = sweep.sweep(members, {
+        "nominate_mid_1": np.linspace(-1, 1, 200),
+        "nominate_mid_2": np.linspace(-1, 1, 200)
+    })
+    # result["probs"] has shape (# members, 200, 200)
+    plot_sweep_heatmap(result, "./sweep.png")
+'''
+
+MEMBER_FEATURES = [
+    "party_code_1", "party_code_2", "chamber",
+    "pieces_cosponsored", "num_congresses",
+    "nominate_dim1", "nominate_dim2"
+]
+
+BILL_FEATURES = ["dem_cosponsors", "rep_cosponsors", "nominate_mid_1", "nominate_mid_2"]
+
+# number of (member, bill) pairs pushed through the model at once
+DEFAULT_CHUNK_SIZE = 1 << 18
+
+'''
+Builds a members table (one row per member, with MEMBER_FEATURES, bioname and icpsr) from an NN file,
+for example to sweep an entire chamber.
+'''
+def members_from_nn_file(nn_file_path: str) -> pd.DataFrame:
+    nn_df = pd.read_csv(nn_file_path)
+    members = nn_df.drop_duplicates(subset="icpsr", keep="last")
+    return members[["icpsr", "bioname"] + MEMBER_FEATURES].reset_index(drop=True)
+
+'''
+Wraps a trained model (from make_model) for sweeps. Whether the model uses the voteview dimensions
+is worked out from its number of inputs.
+'''
+class ScenarioSweep:
+    def __init__(self, model: keras.Model, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.model = model
+        self.chunk_size = chunk_size
+
+        num_inputs = model.input_shape[-1]
+        if num_inputs == len(INPUT_COLUMNS):
+            self.columns = INPUT_COLUMNS
+        elif num_inputs == len(INPUT_COLUMNS_NO_VV):
+            self.columns = INPUT_COLUMNS_NO_VV
+        else:
+            raise ValueError(f"model has {num_inputs} inputs, expected {len(INPUT_COLUMNS)} or {len(INPUT_COLUMNS_NO_VV)}")
+
+        self.member_columns = [c for c in self.columns if c in MEMBER_FEATURES]
+        self.bill_columns = [c for c in self.columns if c in BILL_FEATURES]
+
+        dense_layers = [layer for layer in model.layers if isinstance(layer, keras.layers.Dense)]
+        first_layer = dense_layers[0]
+        kernel, bias = first_layer.get_weights()
+
+        member_rows = [self.columns.index(c) for c in self.member_columns]
+        self.member_kernel = kernel[member_rows]
+        self.bill_kernel = {c: kernel[self.columns.index(c)] for c in self.bill_columns}
+        self.bias = bias
+
+        # the rest of the network, starting from the first layer's pre-activation
+        tail_input = keras.Input(shape=(kernel.shape[1],))
+        x = keras.layers.Activation(first_layer.activation)(tail_input)
+        for layer in dense_layers[1:]:
+            x = layer(x)
+        self.tail = keras.Model(tail_input, x)
+
+        # member feature vector (as bytes) -> first layer encoding
+        self.member_cache = dict()
+
+    '''
+    First layer encodings (without the bias) of each row of the members table, computed once per unique member.
+    '''
+    def encode_members(self, members: pd.DataFrame) -> np.ndarray:
+        member_values = members[self.member_columns].to_numpy(dtype=np.float32)
+        unique_values, inverse = np.unique(member_values, axis=0, return_inverse=True)
+
+        unique_encodings = np.empty((len(unique_values), self.member_kernel.shape[1]), dtype=np.float32)
+        for i, values in enumerate(unique_values):
+            key = values.tobytes()
+            if key not in self.member_cache:
+                self.member_cache[key] = values @ self.member_kernel
+            unique_encodings[i] = self.member_cache[key]
+
+        return unique_encodings[inverse.reshape(-1)]
+
+    '''
+    First layer encodings (including the bias) of every bill in the grid, flattened to (# bills, hidden units).
+    Each axis value is encoded once and the encodings are broadcast-added over the grid.
+    '''
+    def encode_bills(self, axes: dict, fixed: dict) -> np.ndarray:
+        encoding = self.bias.astype(np.float32)
+
+        for column, value in fixed.items():
+            encoding = encoding + value * self.bill_kernel[column]
+
+        for axis, (column, values) in enumerate(axes.items()):
+            axis_encoding = np.outer(values, self.bill_kernel[column]).astype(np.float32)
+            # shape it as (1, ..., len(values), ..., 1, hidden) so it broadcasts along its own axis
+            shape = [1] * len(axes) + [axis_encoding.shape[1]]
+            shape[axis] = len(values)
+            encoding = encoding + axis_encoding.reshape(shape)
+
+        return encoding.reshape(-1, self.bias.shape[0])
+
+    '''
+    Predicts the probability of a YES vote for each member on every bill in the grid.
+
+    - members: a DataFrame with the MEMBER_FEATURES columns (and optionally bioname), one row per member
+    - grid: bill feature -> values to sweep over (any of BILL_FEATURES the model uses)
+    - fixed: values for the model's bill features that are not in the grid (default 0)
+
+    Returns a dict with "probs", an array of shape (# members, len(values of 1st grid feature), ...),
+    "axes" (the grid, in order), "members" (names) and "seconds" (time taken).
+    '''
+    def sweep(self, members: pd.DataFrame, grid: dict, fixed: dict = None) -> dict:
+        start = time.perf_counter()
+
+        unknown = [c for c in grid if c not in self.bill_columns]
+        if unknown:
+            raise ValueError(f"cannot sweep over {unknown}, the model's bill features are {self.bill_columns}")
+
+        axes = {column: np.asarray(values, dtype=np.float32) for column, values in grid.items()}
+        fixed = {c: (fixed or {}).get(c, 0.0) for c in self.bill_columns if c not in axes}
+
+        member_encodings = self.encode_members(members)
+        bill_encodings = self.encode_bills(axes, fixed)
+
+        num_members, num_bills = len(member_encodings), len(bill_encodings)
+        probs = np.empty((num_members, num_bills), dtype=np.float32)
+
+        bills_per_chunk = min(num_bills, self.chunk_size)
+        members_per_chunk = max(1, self.chunk_size // bills_per_chunk)
+
+        for m, b in itertools.product(range(0, num_members, members_per_chunk), range(0, num_bills, bills_per_chunk)):
+            member_chunk = member_encodings[m:m + members_per_chunk]
+            bill_chunk = bill_encodings[b:b + bills_per_chunk]
+
+            pre_activation = (member_chunk[:, None, :] + bill_chunk[None, :, :]).reshape(-1, bill_chunk.shape[1])
+            chunk_probs = self.tail(pre_activation, training=False).numpy()
+
+            probs[m:m + len(member_chunk), b:b + len(bill_chunk)] = chunk_probs.reshape(len(member_chunk), len(bill_chunk))
+
+        names = members["bioname"].tolist() if "bioname" in members else list(range(num_members))
+
+        return {
+            "probs": probs.reshape([num_members] + [len(v) for v in axes.values()]),
+            "axes": axes,
+            "members": names,
+            "seconds": time.perf_counter() - start
+        }
+
+'''
+Saves a heatmap of a two-feature sweep. Shows one member's probabilities if member_index is provided,
+otherwise the share of members expected to vote YES (probability over 0.5) for each bill.
+'''
+def plot_sweep_heatmap(result: dict, output_path: str, member_index: int = None):
+    if len(result["axes"]) != 2:
+        raise ValueError("a heatmap needs a sweep over exactly two bill features")
+
+    (x_name, x_values), (y_name, y_values) = result["axes"].items()
+
+    if member_index is None:
+        values = (result["probs"] > 0.5).mean(axis=0)
+        title = f"Share of {len(result['members'])} Members Voting YES"
+    else:
+        values = result["probs"][member_index]
+        title = f"{result['members'][member_index]}: Probability of YES"
+
+    plt.clf()
+    # probs are indexed [x, y] but imshow wants rows = y
+    plt.imshow(values.T, origin="lower", aspect="auto", vmin=0, vmax=1, cmap="RdBu",
+               extent=[x_values[0], x_values[-1], y_values[0], y_values[-1]])
+    plt.colorbar()
+    plt.xlabel(x_name)
+    plt.ylabel(y_name)
+    plt.title(title)
+    plt.savefig(output_path, dpi=300)
@@ -1,6 +1,7 @@
-import csv
 from pathlib import Path
 
+from preprocessing.voteview_loader import load_voteview
+
 '''
 Data Processing, Step 1:
 
@@ -34,36 +35,18 @@ def cleanse_bills(rollcalls_senate_path: str, rollcalls_house_path: str):
     # appends the CLEANSED suffix
     senate_output_path = senate_input_path.with_name(senate_input_path.stem + "_CLEANSED" + senate_input_path.suffix)
 
-    senate_bill_numbers = set()
-
-    with open(rollcalls_senate_path) as rollcalls_file, open(senate_output_path, "w") as cleansed_file:
-        reader = csv.DictReader(rollcalls_file)
-        writer = csv.DictWriter(cleansed_file, fieldnames=reader.fieldnames)
-
-        # dict writer will not write the names unless we tell it to
-        writer.writeheader()
-
-        for row in reader:
-            result = row['vote_result']
+    senate_rollcalls = load_voteview(rollcalls_senate_path, "rollcalls")
+    senate_cleansed = senate_rollcalls[senate_rollcalls["vote_result"].isin(SENATE_ALLOWED_RESULTS)]
+    senate_cleansed.to_csv(senate_output_path, index=False)
 
-            if result in SENATE_ALLOWED_RESULTS:
-                writer.writerow(row)
-                senate_bill_numbers.add(row['bill_number'])
+    senate_bill_numbers = set(senate_cleansed["bill_number"])
 
     house_input_path = Path(rollcalls_house_path)
     house_output_path = house_input_path.with_name(house_input_path.stem + "_CLEANSED" + house_input_path.suffix)
 
-    with open(house_input_path) as house_file, open(house_output_path, "w") as cleansed_file:
-        reader = csv.DictReader(house_file)
-        writer = csv.DictWriter(cleansed_file, fieldnames=reader.fieldnames)
-
-        writer.writeheader()
-
-        for row in reader:
-            question = row['vote_question']
-            bill_number = row['bill_number']
-
-            if question in HOUSE_ALLOWED_QUESTIONS and bill_number in senate_bill_numbers:
-                writer.writerow(row)
+    house_rollcalls = load_voteview(rollcalls_house_path, "rollcalls")
+    house_cleansed = house_rollcalls[house_rollcalls["vote_question"].isin(HOUSE_ALLOWED_QUESTIONS)
+                                     & house_rollcalls["bill_number"].isin(senate_bill_numbers)]
+    house_cleansed.to_csv(house_output_path, index=False)
 
 # cleanse_bills("/Users/jakesquatrito/Downloads/S118_rollcalls.csv", "/Users/jakesquatrito/Downloads/H118_rollcalls.csv")
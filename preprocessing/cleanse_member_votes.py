@@ -1,6 +1,7 @@
-import csv
 from pathlib import Path
 
+from preprocessing.voteview_loader import load_voteview
+
 '''
 Data Processing, Step 2:
 
@@ -10,31 +11,15 @@ outputs a cleansed "Member's Votes" CSV, which will only retain votes with a rol
 found in the cleansed rollcall dataset.
 '''
 def cleanse_member_votes(cleansed_rollcalls_path: str, members_votes_path: str):
-    relevant_rollnums = set()
-
     # getting the roll numbers we want to keep
-    with open(cleansed_rollcalls_path) as cleansed_rollcalls_file:
-        reader = csv.DictReader(cleansed_rollcalls_file)
-
-        for row in reader:
-            roll_number = row['rollnumber']
-
-            relevant_rollnums.add(roll_number)
+    relevant_rollnums = load_voteview(cleansed_rollcalls_path, "rollcalls", columns=["rollnumber"])["rollnumber"]
 
     members_input_path = Path(members_votes_path)
     members_output_path = members_input_path.with_name(members_input_path.stem + "_CLEANSED" + members_input_path.suffix)
 
-    with open(members_votes_path) as members_votes_file, open(members_output_path, 'w') as cleansed_file:
-        reader = csv.DictReader(members_votes_file)
-        writer = csv.DictWriter(cleansed_file, fieldnames=reader.fieldnames)
-
-        writer.writeheader()
-
-        for row in reader:
-            rollnumber = row['rollnumber']
-
-            if rollnumber in relevant_rollnums:
-                writer.writerow(row)
+    members_votes = load_voteview(members_votes_path, "votes")
+    cleansed_votes = members_votes[members_votes["rollnumber"].isin(relevant_rollnums)]
+    cleansed_votes.to_csv(members_output_path, index=False)
 
 # okay to use cleansed or cleansed API files for this! (but cleansed files are expected)
 # cleanse_member_votes("/Users/jakesquatrito/Downloads/S118_rollcalls_CLEANSED.csv", "/Users/jakesquatrito/Downloads/S118_votes.csv")
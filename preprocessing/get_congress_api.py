@@ -1,8 +1,10 @@
-import csv
+import pandas as pd
 import requests
 from pathlib import Path
 from tqdm import tqdm
 
+from preprocessing.voteview_loader import load_voteview
+
 '''
 
 Data Processing, Step 3:
@@ -48,42 +50,42 @@ def congress_api_legislators(member_path: str, congress_num: int):
     member_input_path = Path(member_path)
     member_output_path = member_input_path.with_name(member_input_path.stem + "_API" + member_input_path.suffix)
 
-    # endpoint is /memeber/{bioguideId}
-    with open(member_path) as member_input_file, open(member_output_path, 'w') as member_output_file:
-        reader = csv.DictReader(member_input_file)
-        writer = csv.DictWriter(member_output_file, fieldnames=reader.fieldnames + ["pieces_cosponsored", "num_congresses"])
+    members = load_voteview(member_path, "members")
+    api_rows = []
 
-        writer.writeheader()
+    # endpoint is /memeber/{bioguideId}
+    for row in tqdm(members.to_dict("records")):
+        member_bioguide = row["bioguide_id"]
 
-        for row in tqdm(reader):
-            member_bioguide = row["bioguide_id"]
+        endpoint_url = f"{API_URL}/member/{member_bioguide}"
+        params = {
+            "format": "json",
+            "api_key": API_KEY
+        }
 
-            endpoint_url = f"{API_URL}/member/{member_bioguide}"
-            params = {
-                "format": "json",
-                "api_key": API_KEY
-            }
+        response = requests.get(endpoint_url, params=params)
+        response.raise_for_status()
 
-            response = requests.get(endpoint_url, params=params)
-            response.raise_for_status()
+        data = response.json()
 
-            data = response.json()
+        if "member" not in data:
+            print(f"WARNING: Skipping for {row}")
+            continue
 
-            if "member" not in data:
-                print(f"WARNING: Skipping for {row}")
-                continue
+        member_terms = data["member"]["terms"]
 
-            member_terms = data["member"]["terms"]
+        # the api returns "terms" as each congress they have served in
+        num_congresses = len([t for t in member_terms if t["congress"] < congress_num])
+        num_cosponsored = data["member"]["cosponsoredLegislation"]["count"]
 
-            # the api returns "terms" as each congress they have served in
-            num_congresses = len([t for t in member_terms if t["congress"] < congress_num])
-            num_cosponsored = data["member"]["cosponsoredLegislation"]["count"]
+        api_row = dict(row)
+        api_row["pieces_cosponsored"] = num_cosponsored
+        api_row["num_congresses"] = num_congresses
 
-            api_row = dict(row)
-            api_row["pieces_cosponsored"] = num_cosponsored
-            api_row["num_congresses"] = num_congresses
+        api_rows.append(api_row)
 
-            writer.writerow(api_row)
+    pd.DataFrame(api_rows, columns=members.columns.tolist() + ["pieces_cosponsored", "num_congresses"]) \
+        .to_csv(member_output_path, index=False)
 
 '''
 Outputs an augmented version of the supplied cleansed Congressional Votes (rollcalls) file with additional data from 
@@ -93,46 +95,46 @@ def congress_api_legislation(cleansed_rollcalls_path: str, congress_num: int):
     rollcalls_input_path = Path(cleansed_rollcalls_path)
     rollcalls_output_path = rollcalls_input_path.with_name(rollcalls_input_path.stem + "_API" + rollcalls_input_path.suffix)
 
-    # API endpoint is "/bill/{congress}/{billType}/{billNumber}/cosponsors
-    with open(cleansed_rollcalls_path) as cleansed_rollcalls_file, open(rollcalls_output_path, "w") as rollcalls_output_file:
-        reader = csv.DictReader(cleansed_rollcalls_file)
-        writer = csv.DictWriter(rollcalls_output_file, reader.fieldnames + ["dem_cosponsors", "rep_cosponsors"])
+    rollcalls = load_voteview(cleansed_rollcalls_path, "rollcalls")
+    api_rows = []
 
-        writer.writeheader()
+    # API endpoint is "/bill/{congress}/{billType}/{billNumber}/cosponsors
+    for row in tqdm(rollcalls.to_dict("records")):
+        bill_num_str = row['bill_number']
+        bill_type, bill_num = split_bill_num_str(bill_num_str)
 
-        for row in tqdm(reader):
-            bill_num_str = row['bill_number']
-            bill_type, bill_num = split_bill_num_str(bill_num_str)
+        endpoint_url = f"{API_URL}/bill/{congress_num}/{bill_type}/{bill_num}/cosponsors"
+        params = {
+            "format": "json",
+            "api_key": API_KEY,
+            # the results are paginated. we don't need that
+            "limit": 999
+        }
 
-            endpoint_url = f"{API_URL}/bill/{congress_num}/{bill_type}/{bill_num}/cosponsors"
-            params = {
-                "format": "json",
-                "api_key": API_KEY,
-                # the results are paginated. we don't need that
-                "limit": 999
-            }
+        response = requests.get(endpoint_url, params=params)
+        response.raise_for_status()
 
-            response = requests.get(endpoint_url, params=params)
-            response.raise_for_status()
+        data = response.json()
 
-            data = response.json()
+        cosponsors = data["cosponsors"]
+        rep_cosponsors = 0
+        dem_cosponsors = 0
 
-            cosponsors = data["cosponsors"]
-            rep_cosponsors = 0
-            dem_cosponsors = 0
+        for cosponsor in cosponsors:
+            if cosponsor["party"] == "D":
+                dem_cosponsors += 1
 
-            for cosponsor in cosponsors:
-                if cosponsor["party"] == "D":
-                    dem_cosponsors += 1
+            if cosponsor["party"] == "R":
+                rep_cosponsors += 1
 
-                if cosponsor["party"] == "R":
-                    rep_cosponsors += 1
+        api_row = dict(row)
+        api_row["dem_cosponsors"] = dem_cosponsors
+        api_row["rep_cosponsors"] = rep_cosponsors
 
-            api_row = dict(row)
-            api_row["dem_cosponsors"] = dem_cosponsors
-            api_row["rep_cosponsors"] = rep_cosponsors
+        api_rows.append(api_row)
 
-            writer.writerow(api_row)
+    pd.DataFrame(api_rows, columns=rollcalls.columns.tolist() + ["dem_cosponsors", "rep_cosponsors"]) \
+        .to_csv(rollcalls_output_path, index=False)
 
 # congress_api_legislation("/Users/jakesquatrito/Downloads/H118_rollcalls_CLEANSED.csv", 118)
 # congress_api_legislation("/Users/jakesquatrito/Downloads/S118_rollcalls_CLEANSED.csv", 118)
@@ -1,6 +1,7 @@
-import csv
 import pandas as pd
 
+from preprocessing.voteview_loader import load_voteview
+
 '''
 
 4. Neural Network Preprocessing
@@ -39,9 +40,9 @@ BILL_KEYS = ["nominate_mid_1", "nominate_mid_2", "dem_cosponsors", "rep_cosponso
 CHAMBER_MAPPING = { "House": 0, "Senate": 1 }
 
 # the first (left, MSB) digit
-PARTY_MAPPING_1 = { "100": 0, "200": 0, "328": 1 }
+PARTY_MAPPING_1 = { 100: 0, 200: 0, 328: 1 }
 # the second (right, LSB) digit
-PARTY_MAPPING_2 = { "100": 0, "200": 1, "328": 1 }
+PARTY_MAPPING_2 = { 100: 0, 200: 1, 328: 1 }
 
 # yes = 1, no = 0
 VOTE_MAPPING = {
@@ -54,70 +55,36 @@ VOTE_MAPPING = {
 }
 
 def nn_dataset_merging(members_api: str, rollcalls_cleansed_api: str, votes_cleansed: str) -> pd.DataFrame:
-    # 1. build a dictionary mapping members to their ICPSRs for quick access
+    # 1. members, keyed by their ICPSRs
     # FIELDS: party, state, age, chamber, dim1, dim2, pieces cosponsored, terms in office
     # AND ALSO: bioguide ID, ICPSR (key), name
+    members_df = load_voteview(members_api, "members", columns=["icpsr"] + MEMBER_KEYS)
+    # if a member is listed twice, the last row wins
+    members_df = members_df.drop_duplicates(subset="icpsr", keep="last")
 
-    members_dict = dict()
-
-    with open(members_api) as members_file:
-        reader = csv.DictReader(members_file)
-
-        for row in reader:
-            icpsr = int(row["icpsr"])
-
-            dict_for_member = dict()
-            for key in MEMBER_KEYS:
-                dict_for_member[key] = row[key]
-
-            members_dict[icpsr] = dict_for_member
-
-    # 2. build a dictionary mapping bills to their rollcall numbers for quick access
+    # 2. bills, keyed by their rollcall numbers
     # FIELDS: dim1, dim2, dem cosponsors, rep cosponsors
     # AND ALSO: bill # (like HR1234), bill description
+    bills_df = load_voteview(rollcalls_cleansed_api, "rollcalls", columns=["rollnumber"] + BILL_KEYS)
+    bills_df = bills_df.drop_duplicates(subset="rollnumber", keep="last")
 
-    bill_dict = dict()
-
-    with open(rollcalls_cleansed_api) as rollcalls_file:
-        reader = csv.DictReader(rollcalls_file)
-
-        for row in reader:
-            rollnumber = row["rollnumber"]
-
-            dict_for_bill = dict()
-            for key in BILL_KEYS:
-                dict_for_bill[key] = row[key]
-
-            bill_dict[rollnumber] = dict_for_bill
-
-    # 3. read through the actual votes. each vote will become a row. have to add the relevant information from the dictionaries.
-    row_dictionaries = []
-    with open(votes_cleansed) as votes_file:
-        reader = csv.DictReader(votes_file)
-
-        for row in reader:
-            rollnumber = row["rollnumber"]
-            # sometimes the data is a double (thanks voteview :/)
-            icpsr = int(float(row["icpsr"]))
-
-            if icpsr not in members_dict:
-                print(f"Skipping icpsr {icpsr}")
-                continue
-
-            member_info = members_dict[icpsr]
-            bill_info = bill_dict[rollnumber]
+    # 3. the actual votes. each vote will become a row, with the relevant member + bill information joined on.
+    votes_df = load_voteview(votes_cleansed, "votes", columns=["rollnumber", "icpsr", "cast_code"])
 
-            merged_info = member_info | bill_info
+    skipped = votes_df.loc[~votes_df["icpsr"].isin(members_df["icpsr"]), "icpsr"].unique()
+    for icpsr in skipped:
+        print(f"Skipping icpsr {icpsr}")
 
-            merged_info["vote"] = int(float(row["cast_code"]))
-            merged_info["rollnumber"] = rollnumber
-            merged_info["icpsr"] = icpsr
+    # inner join on members drops the skipped votes, every remaining vote must have a bill
+    df = votes_df.merge(members_df, on="icpsr", how="inner", sort=False)
+    df = df.merge(bills_df, on="rollnumber", how="left", sort=False, validate="many_to_one", indicator=True)
 
-            row_dictionaries.append(merged_info)
+    if (df["_merge"] != "both").any():
+        missing = df.loc[df["_merge"] != "both", "rollnumber"].unique()
+        raise KeyError(f"votes reference rollnumbers not in {rollcalls_cleansed_api}: {list(missing)}")
 
-    # build a dataframe from the dictionaries
-    df = pd.DataFrame(row_dictionaries)
-    return df
+    df = df.rename(columns={"cast_code": "vote"})
+    return df[MEMBER_KEYS + BILL_KEYS + ["vote", "rollnumber", "icpsr"]].reset_index(drop=True)
 
 def nn_preprocess(members_api: str, rollcalls_cleansed_api: str, votes_cleansed: str, output_path: str):
     # does the first three steps, which are essentially just bouncing in between the
@@ -0,0 +1,212 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+'''
+Shared loader for the three kinds of VoteView files:
+- "members" (Member Ideology, plus the _API columns added in step 3)
+- "rollcalls" (Congressional Votes, plus the _CLEANSED / _API variants)
+- "votes" (Members' Votes, plus the _CLEANSED variant)
+
+Every stage of the pipeline should load VoteView data through load_voteview instead of
+parsing the CSVs itself. Each kind has declared column types, so an ID is always an int
+and a name is always a string, no matter which file / Congress it came from.
+
+The first time a file is read it is parsed with pandas and written to a sidecar cache
+(one .npy file per column) in a ".voteview_cache" folder next to the CSV. Later reads
+memory-map the .npy files instead of parsing the CSV again. The cache is thrown away
+when the CSV changes: if the CSV's size / mtime no longer match we hash it, and only
+reuse the cache if the hash is still the same (e.g. the file was just touched or copied).
+'''
+
+CACHE_DIR_NAME = ".voteview_cache"
+# bump this whenever the cache layout or the declared types change
+CACHE_VERSION = 1
+
+'''
+Declared types per file kind. Columns not listed here are read as strings.
+
+Integer columns are parsed as floats first - sometimes the data is a double (thanks voteview :/),
+for example an icpsr of "14226.0". They are then converted to int64 as long as no values are missing.
+If some are missing (like "born" for a handful of members) the column stays float64.
+'''
+VOTEVIEW_DTYPES = {
+    "members": {
+        "congress": "int", "chamber": "str", "icpsr": "int", "state_icpsr": "int",
+        "district_code": "int", "state_abbrev": "str", "party_code": "int",
+        "occupancy": "float", "last_means": "float", "bioname": "str", "bioguide_id": "str",
+        "born": "int", "died": "float", "nominate_dim1": "float", "nominate_dim2": "float",
+        "nominate_log_likelihood": "float", "nominate_geo_mean_probability": "float",
+        "nominate_number_of_votes": "float", "nominate_number_of_errors": "float",
+        "conditional": "float", "nokken_poole_dim1": "float", "nokken_poole_dim2": "float",
+        # added by get_congress_api
+        "pieces_cosponsored": "int", "num_congresses": "int"
+    },
+    "rollcalls": {
+        "congress": "int", "chamber": "str", "rollnumber": "int", "date": "str",
+        "session": "int", "clerk_rollnumber": "int", "yea_count": "int", "nay_count": "int",
+        "nominate_mid_1": "float", "nominate_mid_2": "float",
+        "nominate_spread_1": "float", "nominate_spread_2": "float",
+        "nominate_log_likelihood": "float", "bill_number": "str", "vote_result": "str",
+        "vote_desc": "str", "vote_question": "str", "dtl_desc": "str",
+        # added by get_congress_api
+        "dem_cosponsors": "int", "rep_cosponsors": "int"
+    },
+    "votes": {
+        "congress": "int", "chamber": "str", "rollnumber": "int", "icpsr": "int",
+        "cast_code": "int", "prob": "float"
+    }
+}
+
+# VoteView writes a missing "prob" in the votes files as N/A
+NUMERIC_NA_VALUES = ["", "N/A", "NA"]
+
+'''
+Loads a VoteView CSV of the given kind ("members", "rollcalls" or "votes") as a DataFrame with the
+declared column types. If columns is provided, only those columns are returned (in that order).
+
+Set use_cache=False to always parse the CSV (the cache is then neither read nor written).
+'''
+def load_voteview(path: str, kind: str, columns: list[str] = None, use_cache: bool = True) -> pd.DataFrame:
+    if kind not in VOTEVIEW_DTYPES:
+        raise ValueError(f"kind must be one of {list(VOTEVIEW_DTYPES)}, got {kind}")
+
+    csv_path = Path(path)
+
+    if not use_cache:
+        return _parse_csv(csv_path, kind, columns)
+
+    cache_path = _cache_path(csv_path, kind)
+    meta = _valid_cache_meta(csv_path, cache_path)
+
+    if meta is None:
+        df = _parse_csv(csv_path, kind, None)
+        _write_cache(csv_path, cache_path, df)
+        return df if columns is None else df[columns]
+
+    return _read_cache(cache_path, meta, columns)
+
+'''
+Parses the CSV with the declared types. Always reads the header first so that a projection only
+touches the columns that were asked for.
+'''
+def _parse_csv(csv_path: Path, kind: str, columns: list[str]) -> pd.DataFrame:
+    declared = VOTEVIEW_DTYPES[kind]
+    header = pd.read_csv(csv_path, nrows=0).columns.tolist()
+
+    if columns is not None:
+        missing = [c for c in columns if c not in header]
+        if missing:
+            raise KeyError(f"{csv_path} has no columns {missing}")
+        header = columns
+
+    read_dtypes = {}
+    na_values = {}
+    for column in header:
+        declared_type = declared.get(column, "str")
+        if declared_type in ("int", "float"):
+            read_dtypes[column] = "float64"
+            na_values[column] = NUMERIC_NA_VALUES
+        else:
+            read_dtypes[column] = "object"
+            na_values[column] = [""]
+
+    df = pd.read_csv(csv_path, usecols=header, dtype=read_dtypes, keep_default_na=False, na_values=na_values)
+    df = df[header]
+
+    for column in header:
+        declared_type = declared.get(column, "str")
+
+        if declared_type == "int" and not df[column].isna().any():
+            df[column] = df[column].astype(np.int64)
+        elif declared_type == "str":
+            df[column] = df[column].fillna("").astype(str)
+
+    return df
+
+def _cache_path(csv_path: Path, kind: str) -> Path:
+    return csv_path.parent / CACHE_DIR_NAME / f"{csv_path.name}.{kind}"
+
+def _file_hash(csv_path: Path) -> str:
+    sha = hashlib.sha1()
+    with open(csv_path, "rb") as csv_file:
+        for chunk in iter(lambda: csv_file.read(1 << 20), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+'''
+Returns the cache's metadata if the cache is still valid for the CSV, otherwise None.
+'''
+def _valid_cache_meta(csv_path: Path, cache_path: Path):
+    meta_path = cache_path / "meta.json"
+    if not meta_path.exists():
+        return None
+
+    with open(meta_path) as meta_file:
+        meta = json.load(meta_file)
+
+    if meta.get("version") != CACHE_VERSION:
+        return None
+
+    stat = csv_path.stat()
+    if meta["size"] == stat.st_size and meta["mtime_ns"] == stat.st_mtime_ns:
+        return meta
+
+    # mtime / size changed - the contents might not have, so check the hash before re-parsing
+    if meta["size"] != stat.st_size or meta["sha1"] != _file_hash(csv_path):
+        return None
+
+    meta["mtime_ns"] = stat.st_mtime_ns
+    with open(meta_path, "w") as meta_file:
+        json.dump(meta, meta_file)
+
+    return meta
+
+def _write_cache(csv_path: Path, cache_path: Path, df: pd.DataFrame):
+    os.makedirs(cache_path, exist_ok=True)
+
+    column_files = []
+    for i, column in enumerate(df.columns):
+        values = df[column].to_numpy()
+        # strings are stored as fixed-width unicode so they can be memory-mapped like the numbers
+        if values.dtype == object:
+            values = values.astype(str)
+
+        file_name = f"{i}.npy"
+        np.save(cache_path / file_name, values, allow_pickle=False)
+        column_files.append(file_name)
+
+    stat = csv_path.stat()
+    meta = {
+        "version": CACHE_VERSION,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha1": _file_hash(csv_path),
+        "columns": df.columns.tolist(),
+        "files": column_files
+    }
+
+    # the meta file is written last, so a half-written cache is never considered valid
+    with open(cache_path / "meta.json", "w") as meta_file:
+        json.dump(meta, meta_file)
+
+def _read_cache(cache_path: Path, meta: dict, columns: list[str]) -> pd.DataFrame:
+    cached_files = dict(zip(meta["columns"], meta["files"]))
+
+    if columns is None:
+        columns = meta["columns"]
+
+    missing = [c for c in columns if c not in cached_files]
+    if missing:
+        raise KeyError(f"{cache_path} has no columns {missing}")
+
+    data = dict()
+    for column in columns:
+        values = np.load(cache_path / cached_files[column], mmap_mode="r", allow_pickle=False)
+        data[column] = pd.Series(values, dtype=str) if values.dtype.kind == "U" else values
+
+    return pd.DataFrame(data, columns=columns)